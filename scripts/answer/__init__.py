@@ -1,28 +1,58 @@
 """
 Functions for processing catechism answers.
 """
-from typing import List, Tuple, Dict
+from typing import List, Tuple
 import re
 
 from shared.models import Question, Section, Footnote
 from shared.utils import (
     escape_latex, 
-    detect_list_sections,
-    is_enumerated_list_item,
-    is_bracketed_list_item,
-    extract_list_item_number,
-    strip_list_item_number
+    footnote_mark,
+    is_list_item,
+    partition_list_sections,
+    MIN_LIST_ITEMS
 )
 
 
-def detect_hierarchical_answer(sections: List[Section]) -> bool:
-    """Detect if the answer has a hierarchical structure with numbered main sections."""
-    # Look for sections that start with patterns like "1. From" or "2. From"
-    hierarchical_pattern = re.compile(r'^\d+\.\s+From\s+')
+# Answer layouts, as returned by detect_answer_layout
+HIERARCHICAL_ANSWER = "hierarchical"
+LIST_ANSWER = "list"
+REGULAR_ANSWER = "regular"
+
+
+# Main section headers in hierarchical answers, e.g. "1. From those who..."
+_HIER_RE = re.compile(r'^\d+\.\s+From\s')
+
+# Any numbered section start within a hierarchical answer
+_NUMBERED_SECTION_RE = re.compile(r'^\d+\.\s')
+
+
+def detect_answer_layout(sections: List[Section]) -> str:
+    """Classify an answer as hierarchical, list or regular in a single pass.
     
-    # Check if there are multiple (3+) sections matching this pattern
-    hierarchical_sections = [s for s in sections if s.text and hierarchical_pattern.match(s.text)]
-    return len(hierarchical_sections) >= 3
+    Args:
+        sections: List of Section objects
+        
+    Returns:
+        One of HIERARCHICAL_ANSWER, LIST_ANSWER or REGULAR_ANSWER
+    """
+    hierarchical_count = 0
+    list_count = 0
+    
+    for text, _ in sections:
+        # Every "1. From" header is also a list item, so only list items
+        # need the more specific hierarchical check
+        if not is_list_item(text):
+            continue
+        list_count += 1
+        
+        # Hierarchical answers take precedence; stop at the third header
+        if _HIER_RE.match(text):
+            hierarchical_count += 1
+            if hierarchical_count >= 3:
+                return HIERARCHICAL_ANSWER
+    
+    return LIST_ANSWER if list_count >= MIN_LIST_ITEMS else REGULAR_ANSWER
 
 
 def process_answer(question: Question) -> Tuple[str, List[Footnote]]:
@@ -34,15 +64,39 @@ def process_answer(question: Question) -> Tuple[str, List[Footnote]]:
     Returns:
         Tuple of (LaTeX representation of the answer, List of footnotes)
     """
-    # First check if this is a hierarchical answer
-    if detect_hierarchical_answer(question.sections):
-        return process_hierarchical_answer(question.sections)
-    # Then check if it's a regular list
-    elif detect_list_sections(question.sections):
-        return process_list_answer(question.sections)
-    # Otherwise process as regular text
+    # The loader already drops empty sections; Questions built elsewhere may
+    # still have them, so filter once here and the renderers never see them
+    sections = question.sections
+    if not all(text for text, _ in sections):
+        sections = [section for section in sections if section.text]
+    
+    # Use the layout computed at load time, or decide it with one pass over
+    # the sections
+    layout = question.layout or detect_answer_layout(sections)
+    
+    if layout == HIERARCHICAL_ANSWER:
+        return process_hierarchical_answer(sections)
+    elif layout == LIST_ANSWER:
+        return process_list_answer(*partition_list_sections(sections))
     else:
-        return process_regular_answer(question.sections)
+        return process_regular_answer(sections)
+
+
+def add_footnote(footnotes: List[Footnote], verses: str) -> str:
+    """Append the next numbered footnote and return its superscript marker.
+    
+    Args:
+        footnotes: Footnotes of the answer so far, numbered from 1
+        verses: Verse references of the new footnote
+        
+    Returns:
+        The LaTeX superscript referencing the new footnote
+    """
+    # The number always follows the footnotes already collected, so numbering
+    # continues across the intro and list parts of an answer
+    number = len(footnotes) + 1
+    footnotes.append(Footnote(number=number, verses=verses))
+    return footnote_mark(number)
 
 
 def process_regular_answer(sections: List[Section]) -> Tuple[str, List[Footnote]]:
@@ -55,29 +109,21 @@ def process_regular_answer(sections: List[Section]) -> Tuple[str, List[Footnote]
         Tuple of (LaTeX representation of the answer, List of footnotes)
     """
     # Build the answer text with footnote markers
-    latex = "A: "
+    parts = ["A: "]
     footnotes = []
-    footnote_counter = 1
+    append = parts.append
     
-    for section in sections:
-        if not section.text:
-            continue
-        
+    for text, verses in sections:
         # Escape special LaTeX characters
-        escaped_text = escape_latex(section.text)
+        escaped_text = escape_latex(text)
         
-        if section.verses:
+        if verses:
             # Add a superscript footnote reference
-            latex += f"{escaped_text}$^{{{footnote_counter}}}$ "
-            footnotes.append(Footnote(
-                number=footnote_counter,
-                verses=section.verses
-            ))
-            footnote_counter += 1
+            append(f"{escaped_text}{add_footnote(footnotes, verses)} ")
         else:
-            latex += f"{escaped_text} "
+            append(f"{escaped_text} ")
     
-    return latex.strip(), footnotes
+    return "".join(parts).strip(), footnotes
 
 
 def process_hierarchical_answer(sections: List[Section]) -> Tuple[str, List[Footnote]]:
@@ -89,104 +135,67 @@ def process_hierarchical_answer(sections: List[Section]) -> Tuple[str, List[Foot
     Returns:
         Tuple of (LaTeX representation of the answer, List of footnotes)
     """
-    latex = "A: "
+    parts = ["A: "]
     footnotes = []
-    footnote_counter = 1
+    match = _NUMBERED_SECTION_RE.match
+    append = parts.append
     
-    # Track if we're in a numbered section
-    in_numbered_section = False
+    for i, (text, verses) in enumerate(sections):
+        # Add a blank line before each numbered section (except the first one).
+        # The answer always starts with "A: ", so there is no need to re-strip
+        # the accumulated text on every header.
+        if i > 0 and match(text):
+            append("\n\n")
+        
+        # Add the section text, with its footnote marker if it has verses
+        append(escape_latex(text))
+        append(f"{add_footnote(footnotes, verses)} " if verses else " ")
     
-    for i, section in enumerate(sections):
-        if not section.text:
-            continue
-        
-        # Check if this is a main section header
-        section_match = re.match(r'^(\d+)\.\s+(.*)', section.text)
-        
-        # Escape special LaTeX characters
-        escaped_text = escape_latex(section.text)
-        
-        if section_match:
-            # This starts a new numbered section
-            in_numbered_section = True
-            
-            # Add a blank line before each numbered section (except the first one)
-            if i > 0 and latex.strip():
-                latex += "\n\n"
-        
-        # Add the section text
-        latex += escaped_text
-        
-        # Add footnote if present
-        if section.verses:
-            latex += f"$^{{{footnote_counter}}}$ "
-            footnotes.append(Footnote(number=footnote_counter, verses=section.verses))
-            footnote_counter += 1
-        else:
-            latex += " "
-    
-    return latex.strip(), footnotes
+    return "".join(parts).strip(), footnotes
 
 
-def process_list_answer(sections: List[Section]) -> Tuple[str, List[Footnote]]:
+def process_list_answer(regular_sections: List[Section],
+                        list_sections: List[Section]) -> Tuple[str, List[Footnote]]:
     """Process an answer with list items into LaTeX format.
     
     Args:
-        sections: List of Section objects
+        regular_sections: Section objects forming the introductory text
+        list_sections: List item Section objects with their number prefix removed,
+            as returned by partition_list_sections
         
     Returns:
         Tuple of (LaTeX representation of the answer, List of footnotes)
     """
-    # Separate regular text from list items
-    list_sections = []
-    regular_sections = []
+    # Process regular text; list footnotes are numbered after its footnotes
+    intro_latex, footnotes = process_regular_answer(regular_sections)
     
-    for section in sections:
-        if not section.text:
-            continue
-        
-        if is_enumerated_list_item(section.text) or is_bracketed_list_item(section.text):
-            list_sections.append(section)
-        else:
-            regular_sections.append(section)
+    # Format list items
+    if not list_sections:
+        return intro_latex, footnotes
     
-    # Process regular text
-    intro_latex, footnotes = process_regular_answer(regular_sections)
+    # Collect the intro and the list into a single buffer
+    parts = [intro_latex]
+    append = parts.append
     
-    # Start footnote counter after the intro footnotes
-    footnote_counter = len(footnotes) + 1
+    # Add a blank line after the intro
+    if intro_latex:
+        append("\n\n")
     
-    # Format list items
-    if list_sections:
-        # Add a blank line after the intro
-        if intro_latex:
-            intro_latex += "\n\n"
-        
-        # Start a LaTeX enumerate environment
-        list_latex = "\\begin{enumerate}\n"
-        
-        for section in list_sections:
-            # Escape special LaTeX characters
-            escaped_text = escape_latex(strip_list_item_number(section.text))
-            
-            if section.verses:
-                # Add a list item with a footnote reference
-                list_latex += f"\\item {escaped_text}$^{{{footnote_counter}}}$\n"
-                footnotes.append(Footnote(
-                    number=footnote_counter,
-                    verses=section.verses
-                ))
-                footnote_counter += 1
-            else:
-                # Add a plain list item
-                list_latex += f"\\item {escaped_text}\n"
-        
-        # End the enumerate environment
-        list_latex += "\\end{enumerate}"
+    # Start a LaTeX enumerate environment
+    append("\\begin{enumerate}\n")
+    
+    for text, verses in list_sections:
+        # Escape special LaTeX characters
+        escaped_text = escape_latex(text)
         
-        # Combine intro and list
-        full_latex = intro_latex + list_latex
-    else:
-        full_latex = intro_latex
+        if verses:
+            # Add a list item with a footnote reference
+            append(f"\\item {escaped_text}{add_footnote(footnotes, verses)}\n")
+        else:
+            # Add a plain list item
+            append(f"\\item {escaped_text}\n")
+    
+    # End the enumerate environment
+    append("\\end{enumerate}")
     
-    return full_latex, footnotes
\ No newline at end of file
+    return "".join(parts), footnotes
\ No newline at end of file
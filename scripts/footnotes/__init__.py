@@ -5,7 +5,21 @@ from typing import List
 import math
 
 from shared.models import Footnote
-from shared.utils import create_bible_url, escape_latex
+from shared.utils import create_bible_url, escape_latex, footnote_mark
+
+
+# Framed two-column box wrapping the references
+_FOOTNOTES_START = (
+    "\\begin{mdframed}[linecolor=blue!20,backgroundcolor=blue!5,linewidth=1pt,skipabove=20pt,skipbelow=20pt,innertopmargin=0pt,innerbottommargin=15pt]\n"
+    "\\setlength{\\columnsep}{2em}\n"
+    "\\setlength{\\parindent}{0pt}\n"
+    "\\begin{multicols}{2}\n"
+    "\\footnotesize\\color[RGB]{0, 0, 150}\n"
+)
+_FOOTNOTES_END = "\\end{multicols}\n\\end{mdframed}"
+
+# A single reference line: superscript mark, then the linked verses
+_FOOTNOTE_TEMPLATE = "{mark} \\href{{{url}}}{{{verses}}}\\\\\n"
 
 
 def process_footnotes(footnotes: List[Footnote]) -> str:
@@ -13,25 +27,16 @@ def process_footnotes(footnotes: List[Footnote]) -> str:
     if not footnotes:
         return ""
     
-    # Add URLs to footnotes if not already present
-    for footnote in footnotes:
-        if not footnote.url:
-            footnote.url = create_bible_url(footnote.verses)
-    
-    # Create a framed box with columns for the references
-    latex = "\\begin{mdframed}[linecolor=blue!20,backgroundcolor=blue!5,linewidth=1pt,skipabove=20pt,skipbelow=20pt,innertopmargin=0pt,innerbottommargin=15pt]\n"
-    latex += "\\setlength{\\columnsep}{2em}\n"
-    latex += "\\setlength{\\parindent}{0pt}\n"
-    latex += "\\begin{multicols}{2}\n"
-    latex += "\\footnotesize\\color[RGB]{0, 0, 150}\n"
-    
-    # Process each footnote with proper line breaks
-    for footnote in footnotes:
-        escaped_verses = escape_latex(footnote.verses)
-        latex += f"$^{{{footnote.number}}}$ \\href{{{footnote.url}}}{{{escaped_verses}}}\\\\\n"
-    
-    # Close the environments
-    latex += "\\end{multicols}\n"
-    latex += "\\end{mdframed}"
+    # Render each footnote with proper line breaks, falling back to a
+    # BibleGateway URL without writing it back onto the caller's footnote
+    lines = [
+        _FOOTNOTE_TEMPLATE.format(
+            mark=footnote_mark(footnote.number),
+            url=footnote.url or create_bible_url(footnote.verses),
+            verses=escape_latex(footnote.verses)
+        )
+        for footnote in footnotes
+    ]
     
-    return latex
\ No newline at end of file
+    # Wrap the references in the framed box in a single join
+    return "".join([_FOOTNOTES_START, *lines, _FOOTNOTES_END])
\ No newline at end of file
@@ -1,13 +1,33 @@
 """
 Data models for the catechism conversion.
 """
-from dataclasses import dataclass
-from typing import List, Optional
+import math
+import re
+from dataclasses import dataclass, field
+from typing import List, NamedTuple, Optional, Tuple
 
 
-@dataclass
-class Section:
-    """Represents a section of a catechism question with text and verses."""
+# Numeric question IDs such as "12", "12.1", "12." or ".5"
+_NUMERIC_ID_RE = re.compile(r'\A(?:\d+\.?\d*|\.\d+)\Z')
+
+
+def question_sort_key(q_id: str) -> Tuple[float, str]:
+    """Build the sort key for a question ID.
+    
+    Args:
+        q_id: Question ID, usually numeric such as "12" or "12.1"
+        
+    Returns:
+        Tuple of (numeric value, ID); non-numeric IDs sort after numeric ones by name
+    """
+    return (float(q_id) if _NUMERIC_ID_RE.match(q_id) else math.inf, q_id)
+
+
+class Section(NamedTuple):
+    """Represents a section of a catechism question with text and verses.
+    
+    A plain tuple, so renderers can unpack ``text, verses`` directly.
+    """
     text: str
     verses: str
 
@@ -18,11 +38,20 @@ class Question:
     id: str
     question: str
     sections: List[Section]
+    # Answer layout precomputed at load time; None means detect when rendering
+    layout: Optional[str] = None
+    # Derived from id once, so sorting never re-parses it
+    sort_key: Tuple[float, str] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self) -> None:
+        self.sort_key = question_sort_key(self.id)
 
 
-@dataclass
-class Footnote:
-    """Represents a footnote with number and verse references."""
+class Footnote(NamedTuple):
+    """Represents a footnote with number and verse references.
+    
+    Footnotes are never modified after the answer renderers create them.
+    """
     number: int
     verses: str
     url: Optional[str] = None
\ No newline at end of file
@@ -1,13 +1,58 @@
 """
 Utility functions for the catechism conversion.
 """
-import re
-from typing import Dict, OrderedDict, Any, List
-from collections import OrderedDict
-
-from .models import Question, Section
-
+from __future__ import annotations
 
+import re
+import string
+from functools import lru_cache
+from operator import attrgetter
+from urllib.parse import quote_plus
+from typing import Optional
+
+from .models import Question, Section, question_sort_key
+
+
+# Translation table mapping LaTeX special characters to their escaped versions
+_LATEX_TRANS = str.maketrans({
+    '&': '\\&',
+    '%': '\\%',
+    '$': '\\$',
+    '#': '\\#',
+    '_': '\\_',
+    '{': '\\{',
+    '}': '\\}',
+    '~': '\\textasciitilde{}',
+    '^': '\\textasciicircum{}',
+    '\\': '\\textbackslash{}',
+})
+
+# BibleGateway search URL around the encoded verse reference
+_BIBLE_URL_PREFIX = "https://www.biblegateway.com/passage/?search="
+_BIBLE_URL_SUFFIX = "&version=ESV"
+
+# ASCII form-encoding table equivalent to quote_plus(..., safe=''): unreserved
+# characters pass through, spaces become '+', everything else is %XX-escaped
+_URL_UNRESERVED = frozenset(string.ascii_letters + string.digits + '_.-~')
+_URL_QUOTE_TRANS = str.maketrans({
+    chr(code): '+' if code == 0x20 else f'%{code:02X}'
+    for code in range(128)
+    if chr(code) not in _URL_UNRESERVED
+})
+
+# Footnote superscript shape, and its precomputed forms; no answer comes close
+# to this many footnotes
+_SUPERSCRIPT_FMT = "$^{%d}$"
+_SUPERSCRIPTS = tuple(_SUPERSCRIPT_FMT % number for number in range(256))
+
+# List item prefix: either "1. " or "[1] "
+_LIST_ITEM_RE = re.compile(r'^(?:\d+\.|\[\d+\])\s')
+
+# Minimum number of list item sections for an answer to be formatted as a list
+MIN_LIST_ITEMS = 3
+
+
+@lru_cache(maxsize=None)
 def create_bible_url(verses: str) -> str:
     """Create a URL for BibleGateway search.
     
@@ -17,27 +62,29 @@ def create_bible_url(verses: str) -> str:
     Returns:
         URL to the BibleGateway search for the given verses
     """
-    encoded_verses = verses.replace(' ', '+').replace(':', '%3A').replace(';', '%3B').replace(',', '%2C')
-    return f"https://www.biblegateway.com/passage/?search={encoded_verses}&version=ESV"
+    # Plain ASCII references (all of them, in practice) are encoded in one
+    # translate pass; anything else needs quote_plus to UTF-8 encode first
+    if verses.isascii():
+        encoded_verses = verses.translate(_URL_QUOTE_TRANS)
+    else:
+        encoded_verses = quote_plus(verses, safe='')
+    return _BIBLE_URL_PREFIX + encoded_verses + _BIBLE_URL_SUFFIX
 
 
-def sort_questions(questions: Dict[str, Question]) -> OrderedDict[str, Question]:
+def sort_questions(questions: dict[str, Question]) -> list[Question]:
     """Sort questions by their ID.
     
     Args:
         questions: Dictionary of questions with IDs as keys
         
     Returns:
-        OrderedDict of questions sorted by ID
+        List of questions in ID order
     """
-    def sort_key(id_question_pair):
-        q_id = id_question_pair[0]
-        # Try to convert to float for numerical sorting, otherwise use string sorting
-        return float(q_id) if q_id.replace('.', '', 1).isdigit() else q_id
-        
-    return OrderedDict(sorted(questions.items(), key=sort_key))
+    # Each Question carries the key computed once at construction time
+    return sorted(questions.values(), key=attrgetter('sort_key'))
 
 
+@lru_cache(maxsize=8192)
 def escape_latex(text: str) -> str:
     """Escape special LaTeX characters.
     
@@ -47,111 +94,66 @@ def escape_latex(text: str) -> str:
     Returns:
         Text with LaTeX special characters escaped
     """
-    # Define LaTeX special characters and their escaped versions
-    latex_special_chars = {
-        '&': '\\&',
-        '%': '\\%',
-        '$': '\\$',
-        '#': '\\#',
-        '_': '\\_',
-        '{': '\\{',
-        '}': '\\}',
-        '~': '\\textasciitilde{}',
-        '^': '\\textasciicircum{}',
-        '\\': '\\textbackslash{}',
-    }
-    
-    # Replace all special characters with their escaped versions
-    for char, replacement in latex_special_chars.items():
-        text = text.replace(char, replacement)
-    
-    return text
+    # Replace all special characters with their escaped versions in one pass
+    return text.translate(_LATEX_TRANS)
 
 
-def is_enumerated_list_item(text: str) -> bool:
-    """Check if text starts with a number followed by a period.
+def footnote_mark(number: int) -> str:
+    """Get the LaTeX superscript marking a footnote reference.
     
     Args:
-        text: Text to check
+        number: Footnote number
         
     Returns:
-        True if the text starts with a number followed by a period, False otherwise
+        The number wrapped in a math-mode superscript, e.g. "$^{3}$"
     """
-    pattern = re.compile(r'^(\d+)\.\s')
-    return bool(pattern.match(text))
+    if number < len(_SUPERSCRIPTS):
+        return _SUPERSCRIPTS[number]
+    return _SUPERSCRIPT_FMT % number
 
 
-def is_bracketed_list_item(text: str) -> bool:
-    """Check if text starts with a bracketed number.
+def is_list_item(text: str) -> bool:
+    """Check if text starts with either a numbered or a bracketed list prefix.
     
     Args:
         text: Text to check
         
     Returns:
-        True if the text starts with a bracketed number, False otherwise
-    """
-    pattern = re.compile(r'^\[(\d+)\]\s')
-    return bool(pattern.match(text))
-
-
-def extract_list_item_number(text: str) -> str:
-    """Extract the number from a list item.
-    
-    Args:
-        text: List item text
-        
-    Returns:
-        The number as a string
+        True if the text starts with "1. " or "[1] " style numbering, False otherwise
     """
-    # Check for regular numbered list
-    pattern = re.compile(r'^(\d+)\.\s')
-    match = pattern.match(text)
-    if match:
-        return match.group(1)
-    
-    # Check for bracketed number
-    pattern = re.compile(r'^\[(\d+)\]\s')
-    match = pattern.match(text)
-    if match:
-        return match.group(1)
-    
-    # Default if no match
-    return ""
+    return _LIST_ITEM_RE.match(text) is not None
 
 
-def strip_list_item_number(text: str) -> str:
-    """Remove the number prefix from a list item.
+def split_list_item(text: str) -> Optional[str]:
+    """Classify text as a list item and remove its number prefix in one match.
     
     Args:
-        text: List item text
+        text: Text to check
         
     Returns:
-        Text without the number prefix
+        Text without the number prefix, or None if the text is not a list item
     """
-    # Remove regular numbered list prefix
-    text = re.sub(r'^(\d+)\.\s', '', text)
-    # Remove bracketed number prefix
-    text = re.sub(r'^\[(\d+)\]\s', '', text)
-    return text
+    match = _LIST_ITEM_RE.match(text)
+    return text[match.end():] if match else None
 
 
-def detect_list_sections(sections: List[Section]) -> bool:
-    """Determine if sections should be formatted as a list.
+def partition_list_sections(sections: list[Section]) -> tuple[list[Section], list[Section]]:
+    """Separate regular sections from list items in a single pass.
     
     Args:
         sections: List of Section objects
         
     Returns:
-        True if sections should be formatted as a list, False otherwise
+        Tuple of (regular sections, list item sections with their number prefix removed)
     """
-    # Only examine non-empty sections
-    non_empty_sections = [s for s in sections if s.text]
-    if not non_empty_sections:
-        return False
+    regular_sections = []
+    list_sections = []
     
-    # Check for numbered list items or bracketed numbers
-    enum_count = sum(1 for s in non_empty_sections if 
-                    is_enumerated_list_item(s.text) or is_bracketed_list_item(s.text))
+    for section in sections:
+        item_text = split_list_item(section.text)
+        if item_text is None:
+            regular_sections.append(section)
+        else:
+            list_sections.append(Section(text=item_text, verses=section.verses))
     
-    # If a significant number of sections are list items, format as a list
-    return enum_count >= 3
\ No newline at end of file
+    return regular_sections, list_sections
\ No newline at end of file
@@ -3,165 +3,318 @@
 Convert catechism TOML files directly to LaTeX for better control and debugging.
 """
 from __future__ import annotations
-import toml
-import glob
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+import os
+import sys
 import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TextIO, Tuple
 
 from question import process_question
-from answer import process_answer
+from answer import process_answer, detect_answer_layout
 from footnotes import process_footnotes
 from shared.models import Question, Section, Footnote
 from shared.utils import create_bible_url, sort_questions
 
 
-def load_toml_file(file_path: str) -> List[Question]:
-    """Load and parse a TOML file into Question objects."""
+# Minimum number of source files worth parsing in a process pool
+_PARALLEL_MIN_FILES = 32
+
+# Minimum number of questions worth rendering in a process pool; the whole
+# catechism renders faster in a single process
+_PARALLEL_MIN_QUESTIONS = 2000
+
+# Modules whose source determines the rendered LaTeX of a question
+_RENDERER_MODULES = ('question', 'answer', 'footnotes', 'shared.models', 'shared.utils', __name__)
+
+
+def load_toml_file(file_path: str) -> Tuple[List[Question], List[str]]:
+    """Load and parse a TOML file into Question objects.
+    
+    Returns the questions found along with messages for anything that could
+    not be loaded, so callers can report every problem at once.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = toml.load(file)
-            
-        questions = []
-        # Handle single question file
-        if isinstance(data, dict) and 'id' in data and 'question' in data:
-            questions.append(parse_question_data(data))
-        # Handle multiple question file
-        elif isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict) and 'id' in item and 'question' in item:
-                    questions.append(parse_question_data(item))
-        
-        return questions
-    except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
-        return []
+        # Read the whole file in one call and parse it from memory
+        data = tomllib.loads(Path(file_path).read_bytes().decode('utf-8'))
+    except (OSError, UnicodeDecodeError, tomllib.TOMLDecodeError) as e:
+        return [], [f"{file_path}: {e}"]
+    
+    # Handle single question file, or multiple question file
+    items = data if isinstance(data, list) else [data]
+    
+    questions = []
+    errors = []
+    for item in items:
+        if not (isinstance(item, dict) and 'id' in item and 'question' in item):
+            errors.append(f"{file_path}: entry without an id and question")
+        elif not (isinstance(item['id'], str) and isinstance(item['question'], str)):
+            errors.append(f"{file_path}: entry id and question must be strings")
+        else:
+            questions.append(parse_question_data(item, file_path, errors))
+    
+    return questions, errors
 
 
-def parse_question_data(data: Dict) -> Question:
-    """Parse raw question data into a Question object."""
+def parse_question_data(data: Dict, file_path: str, errors: List[str]) -> Question:
+    """Parse raw question data into a Question object.
+    
+    Malformed sections are skipped, with a message for each added to errors.
+    """
+    where = f"{file_path}: question {data['id']!r}"
     sections = []
-    for section_data in data.get('sections', []):
-        sections.append(Section(
-            text=section_data.get('text', '').strip(),
-            verses=section_data.get('verses', '').strip()
-        ))
+    sections_data = data.get('sections', [])
+    if not isinstance(sections_data, list):
+        errors.append(f"{where}: sections is not an array of tables")
+        sections_data = []
+    
+    for number, section_data in enumerate(sections_data, 1):
+        if not isinstance(section_data, dict):
+            errors.append(f"{where}: section {number} is not a table")
+            continue
+        text = section_data.get('text', '')
+        verses = section_data.get('verses', '')
+        if not isinstance(text, str) or not isinstance(verses, str):
+            errors.append(f"{where}: section {number} has a non-string text or verses")
+            continue
+        # Drop empty sections here so the renderers never have to skip them
+        text = text.strip()
+        if not text:
+            continue
+        sections.append(Section(text=text, verses=verses.strip()))
     
     return Question(
         id=data.get('id', ''),
         question=data.get('question', ''),
-        sections=sections
+        sections=sections,
+        # Sections do not change after loading, so classify the answer once here
+        layout=detect_answer_layout(sections)
     )
 
 
 def find_toml_files(directory: str) -> List[str]:
     """Find all TOML files in the specified directory."""
-    return glob.glob(f'{directory}/*.toml')
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                entry.path for entry in entries
+                if entry.is_file() and entry.name.endswith('.toml') and not entry.name.startswith('.')
+            ]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
 
 
-def process_files(file_paths: List[str]) -> Dict[str, Question]:
-    """Process all TOML files and return sorted questions."""
+def process_files(file_paths: List[str]) -> Tuple[List[Question], List[str]]:
+    """Process all TOML files and return sorted questions with any load errors."""
     all_questions = {}
+    # File each kept question was loaded from, for duplicate reports
+    sources = {}
+    errors = []
+    
+    # Sort so duplicate IDs resolve the same way on every file system
+    file_paths = sorted(file_paths)
     
-    for file_path in file_paths:
-        questions = load_toml_file(file_path)
+    # Parse larger batches across worker processes (results come back in input
+    # order); for a handful of files the pool start-up costs more than it saves
+    if len(file_paths) > _PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor() as executor:
+            loaded = list(executor.map(load_toml_file, file_paths, chunksize=16))
+    else:
+        loaded = [load_toml_file(file_path) for file_path in file_paths]
+    
+    # IDs are meant to be unique; keep the first definition in file name order
+    # and report the rest rather than letting directory order pick a winner
+    for file_path, (questions, file_errors) in zip(file_paths, loaded):
+        errors.extend(file_errors)
         for question in questions:
+            if question.id in all_questions:
+                errors.append(f"{file_path}: duplicate question id {question.id!r}; "
+                              f"keeping the definition in {sources[question.id]}")
+                continue
+            # Common proof texts repeat across questions; intern them here, in
+            # the parent, so identical references share one string object
+            # (worker results arrive as fresh unpickled copies)
+            question.sections = [
+                Section(text=text, verses=sys.intern(verses))
+                for text, verses in question.sections
+            ]
             all_questions[question.id] = question
+            sources[question.id] = file_path
     
-    return sort_questions(all_questions)
+    return sort_questions(all_questions), errors
 
 
-def generate_latex_preamble() -> str:
-    """Generate the LaTeX preamble with document class and package imports."""
-    preamble = "\\documentclass[12pt,article]{article}\n"
+_PREAMBLE = (
+    "\\documentclass[12pt,article]{article}\n"
     
     # Base packages
-    preamble += "\\usepackage{geometry}\n"
-    preamble += "\\geometry{margin=1in}\n"
-    preamble += "\\usepackage{titlesec}\n"
-    preamble += "\\usepackage{xcolor}\n"
-    preamble += "\\usepackage{fancyhdr}\n"
-    preamble += "\\usepackage{fontspec}\n"
-    preamble += "\\setmainfont[Path=./fonts/,UprightFont=EBGaramond12-Regular.otf,ItalicFont=EBGaramond12-Italic.otf]{EB Garamond}\n"
-    preamble += "\\usepackage{setspace}\n"
-    preamble += "\\onehalfspacing\n"
-    preamble += "\\usepackage{mdframed}\n"
-    preamble += "\\usepackage{multicol}\n"
-    preamble += "\\usepackage{enumitem}\n"
-    preamble += "\\usepackage{bookmark}\n"  # For better PDF bookmarks
+    "\\usepackage{geometry}\n"
+    "\\geometry{margin=1in}\n"
+    "\\usepackage{titlesec}\n"
+    "\\usepackage{xcolor}\n"
+    "\\usepackage{fancyhdr}\n"
+    "\\usepackage{fontspec}\n"
+    "\\setmainfont[Path=./fonts/,UprightFont=EBGaramond12-Regular.otf,ItalicFont=EBGaramond12-Italic.otf]{EB Garamond}\n"
+    "\\usepackage{setspace}\n"
+    "\\onehalfspacing\n"
+    "\\usepackage{mdframed}\n"
+    "\\usepackage{multicol}\n"
+    "\\usepackage{enumitem}\n"
+    "\\usepackage{bookmark}\n"  # For better PDF bookmarks
     
     # TOC formatting - load before hyperref
-    preamble += "\\usepackage{tocloft}\n"
-    preamble += "\\setlength{\\cftbeforesecskip}{10pt}\n"
-    preamble += "\\renewcommand{\\cftsecfont}{\\bfseries}\n"
+    "\\usepackage{tocloft}\n"
+    "\\setlength{\\cftbeforesecskip}{10pt}\n"
+    "\\renewcommand{\\cftsecfont}{\\bfseries}\n"
     
     # Hyperref should be loaded last to avoid conflicts
-    preamble += "\\usepackage{hyperref}\n"
-    preamble += "\\hypersetup{\n"
-    preamble += "  colorlinks=true,\n"
-    preamble += "  linkcolor=blue,\n"
-    preamble += "  urlcolor=blue,\n"
-    preamble += "  citecolor=blue,\n"
-    preamble += "  linktoc=all,\n"
-    preamble += "  bookmarksnumbered=true,\n"
-    preamble += "  bookmarksopen=true\n"
-    preamble += "}\n"
+    "\\usepackage{hyperref}\n"
+    "\\hypersetup{\n"
+    "  colorlinks=true,\n"
+    "  linkcolor=blue,\n"
+    "  urlcolor=blue,\n"
+    "  citecolor=blue,\n"
+    "  linktoc=all,\n"
+    "  bookmarksnumbered=true,\n"
+    "  bookmarksopen=true\n"
+    "}\n"
     
     # Remove section numbering
-    preamble += "\\setcounter{secnumdepth}{0}\n"
+    "\\setcounter{secnumdepth}{0}\n"
     
     # Format section headings
-    preamble += "\\titleformat{\\section}{\\LARGE\\bfseries\\color[RGB]{231, 76, 60}}{\\thesection}{1em}{}\n"
-    preamble += "\\titleformat{\\subsection}{\\Large\\bfseries\\color{black}}{\\thesubsection}{1em}{}\n"
+    "\\titleformat{\\section}{\\LARGE\\bfseries\\color[RGB]{231, 76, 60}}{\\thesection}{1em}{}\n"
+    "\\titleformat{\\subsection}{\\Large\\bfseries\\color{black}}{\\thesubsection}{1em}{}\n"
     
     # Setup page headers and footers
-    preamble += "\\pagestyle{fancy}\n"
-    preamble += "\\fancyhead[R]{The Baptist Larger Catechism}\n"
-    preamble += "\\fancyhead[L]{\\thepage}\n"
-    preamble += "\\fancyfoot{}\n"
-    
-    return preamble
+    "\\pagestyle{fancy}\n"
+    "\\fancyhead[R]{The Baptist Larger Catechism}\n"
+    "\\fancyhead[L]{\\thepage}\n"
+    "\\fancyfoot{}\n"
+)
+
+_DOCUMENT_START = (
+    "\\begin{document}\n\n"
+    "\\title{The Baptist Larger Catechism}\n"
+    "\\maketitle\n"
+    "\\tableofcontents\n"
+    "\\newpage\n\n"
+)
+
+_DOCUMENT_END = "\\end{document}\n"
+
+
+def generate_latex_preamble() -> str:
+    """Generate the LaTeX preamble with document class and package imports."""
+    return _PREAMBLE
 
 
 def generate_latex_document_start() -> str:
     """Generate the LaTeX document start with title and TOC."""
-    content = "\\begin{document}\n\n"
-    content += "\\title{The Baptist Larger Catechism}\n"
-    content += "\\maketitle\n"
-    content += "\\tableofcontents\n"
-    content += "\\newpage\n\n"
-    return content
+    return _DOCUMENT_START
 
 
 def generate_latex_document_end() -> str:
     """Generate the LaTeX document end."""
-    return "\\end{document}\n"
+    return _DOCUMENT_END
+
 
+@lru_cache(maxsize=None)
+def renderer_version() -> bytes:
+    """Hash the sources of the rendering code, so cached sections go stale with it."""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in _RENDERER_MODULES:
+        digest.update(Path(sys.modules[name].__file__).read_bytes())
+    return digest.digest()
+
+
+def question_cache_key(question: Question) -> str:
+    """Compute a hash identifying a question's rendered LaTeX.
+    
+    Covers both the question content and the renderer version.
+    """
+    content = repr((question.id, question.question, [tuple(section) for section in question.sections]))
+    digest = hashlib.blake2b(renderer_version(), digest_size=16)
+    digest.update(content.encode('utf-8'))
+    return digest.hexdigest()
 
-def generate_latex(questions: Dict[str, Question], template_path: Optional[str] = None) -> str:
-    """Generate complete LaTeX content from questions."""
+
+def render_question(question: Question, cache_dir: Optional[str] = None) -> str:
+    """Render a single question, its answer and footnotes as a LaTeX section.
+    
+    When cache_dir is given, sections rendered by a previous run for identical
+    question content are read back from disk instead of being regenerated.
+    """
+    if cache_dir is not None:
+        cache_path = Path(cache_dir) / f"{question_cache_key(question)}.tex"
+        try:
+            cached = cache_path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            cached = ""
+        # A missing or unreadable entry is a miss, and so is an empty one, since
+        # a rendered section is never empty
+        if cached:
+            return cached
+    
+    q_latex = process_question(question)
+    a_latex, footnotes = process_answer(question)
+    f_latex = process_footnotes(footnotes)
+    
+    # Combine into a complete question section with controlled spacing
+    section_latex = f"{q_latex}\n\n{a_latex}\n\n{f_latex}\n\n\\vspace{{10pt}}\\hrulefill\n\n"
+    
+    if cache_dir is not None:
+        # Write under a per-process temporary name and rename into place, so a
+        # concurrent or interrupted run never leaves a partial entry behind; the
+        # cache is only an optimisation, so failing to store an entry is ignored
+        temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            temp_path.write_text(section_latex, encoding='utf-8')
+            os.replace(temp_path, cache_path)
+        except OSError:
+            temp_path.unlink(missing_ok=True)
+    
+    return section_latex
+
+
+def generate_latex(questions: List[Question], out: TextIO, template_path: Optional[str] = None,
+                   cache_dir: Optional[str] = None) -> None:
+    """Generate complete LaTeX content from questions in document order, writing it to out."""
     # Generate the document structure
-    latex = generate_latex_preamble()
-    latex += generate_latex_document_start()
-    
-    # Process each question
-    for q_id, question in sorted(questions.items(), key=lambda x: float(x[0]) if x[0].replace('.', '', 1).isdigit() else x[0]):
-        q_latex = process_question(question)
-        a_latex, footnotes = process_answer(question)
-        f_latex = process_footnotes(footnotes)
-        
-        # Combine into a complete question section with controlled spacing
-        section_latex = f"{q_latex}\n\n{a_latex}\n\n{f_latex}\n\n\\vspace{{10pt}}\\hrulefill\n\n"
-        latex += section_latex
-    
-    latex += generate_latex_document_end()
-    return latex
-
-
-def save_latex(content: str, output_path: str) -> None:
-    """Save LaTeX content to a file."""
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write(content)
+    out.write(generate_latex_preamble())
+    out.write(generate_latex_document_start())
+    
+    # Process each question and stream each section out as soon as it is ready
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    render = partial(render_question, cache_dir=cache_dir)
+    
+    # Questions are independent, so very large documents are rendered across
+    # worker processes (map preserves the sorted order); below that the pool
+    # start-up costs more than it saves and would split the escape/URL caches
+    if len(questions) > _PARALLEL_MIN_QUESTIONS:
+        with ProcessPoolExecutor() as executor:
+            for section_latex in executor.map(render, questions, chunksize=16):
+                out.write(section_latex)
+    else:
+        for question in questions:
+            out.write(render(question))
+    
+    out.write(generate_latex_document_end())
+
+
+def save_latex(questions: List[Question], output_path: str, template_path: Optional[str] = None,
+               cache_dir: Optional[str] = None) -> None:
+    """Generate the LaTeX document and stream it to a file."""
+    # A large write buffer keeps the number of write syscalls low
+    with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as file:
+        generate_latex(questions, file, template_path, cache_dir)
     print(f"Conversion complete. LaTeX file created: {output_path}")
 
 
@@ -171,6 +324,10 @@ def main() -> None:
     parser.add_argument('-s', '--source', default='src', help='Source directory containing TOML files')
     parser.add_argument('-o', '--output', default='larger-catechism.tex', help='Output LaTeX file')
     parser.add_argument('-t', '--template', help='Optional LaTeX template file')
+    parser.add_argument('-c', '--cache-dir',
+                        help='Optional directory caching rendered questions between runs; '
+                             'entries are never evicted, so edits leave stale files behind '
+                             'and the directory can be cleared at any time')
     
     args = parser.parse_args()
     
@@ -180,14 +337,15 @@ def main() -> None:
         print(f"No TOML files found in the {args.source} directory.")
         return
     
-    # Process files
-    questions = process_files(toml_files)
-    
-    # Generate LaTeX
-    latex_content = generate_latex(questions, args.template)
+    # Process files, reporting anything that failed to load in one summary
+    questions, errors = process_files(toml_files)
+    if errors:
+        print(f"Skipped {len(errors)} problem(s) while loading {args.source}:")
+        for error in errors:
+            print(f"  {error}")
     
-    # Save the result
-    save_latex(latex_content, args.output)
+    # Generate LaTeX and save the result
+    save_latex(questions, args.output, args.template, args.cache_dir)
 
 
 if __name__ == "__main__":